@@ -2,7 +2,7 @@ from setuptools import setup, find_packages
 
 setup(
     name='PyserSSH',
-    version='5.1.4',
+    version='5.2.0',
     license='MIT',
     author='DPSoftware Foundation',
     author_email='contact@damp11113.xyz',
@@ -36,7 +36,10 @@ setup(
             "mouse",
             "keyboard",
             "Brotli",
+            "msgpack",
             "pillow",
+            "mss",
+            "dxcam; platform_system == 'Windows'",
             "numpy",
             "opencv-python"
         ],
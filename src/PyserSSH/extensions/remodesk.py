@@ -27,13 +27,34 @@ SOFTWARE.
 
 import socket
 import threading
+import platform
 import brotli
 import numpy as np
 import cv2
 from PIL import ImageGrab
+try:
+    import mss
+except ImportError:
+    mss = None
+if platform.system() == "Windows":
+    try:
+        import dxcam
+    except ImportError:
+        dxcam = None
+else:
+    dxcam = None
 import struct
 import queue
-import pickle
+import time
+import msgpack
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+except ImportError:
+    TurboJPEG = None
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
 import mouse
 import keyboard
 import logging
@@ -42,31 +63,117 @@ from ..system.clientype import Client
 
 logger = logging.getLogger("PyserSSH.Ext.RemoDeskSSH")
 
+MOUSE_INTERVAL = 0.004  # apply only latest mouse position every 4 ms
+IDLE_WAIT = 0.01  # wait when screen is not changed and fps is unlimited
+
+RING_SIZE = 3  # preallocated capture buffers shared by grabber and encoder
+
+_HDR = struct.Struct('!III')  # frame length, width, height
+_LEN = struct.Struct('!I')  # command length
+
+ACTIVITY_PIXELS = 500 // 16  # changed pixels to consider as activity (on 1/16 area frame)
+
+if njit:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _count_changed(cur, prev, threshold):
+        # fused absdiff + grayscale + threshold + count, no intermediate image
+        h, w, _ = cur.shape
+        count = 0
+        for y in prange(h):
+            for x in range(w):
+                b = abs(int(cur[y, x, 0]) - int(prev[y, x, 0]))
+                g = abs(int(cur[y, x, 1]) - int(prev[y, x, 1]))
+                r = abs(int(cur[y, x, 2]) - int(prev[y, x, 2]))
+                # same fixed point gray as cv2 BGR2GRAY, so all path count same pixels
+                if (b * 1868 + g * 9617 + r * 4899 + 8192) >> 14 > threshold:
+                    count += 1
+        return count
+else:
+    _count_changed = None
+
 class Protocol:
     def __init__(self, server):
-        self.listclient = []
+        self.clients = {}  # channel: client
+        self.clients_lock = threading.Lock()
+        self.pending = set()  # new channel waiting for last frame, sent by sender thread
         self.first = True
         self.running = False
+        self.session = 0  # increase every new session, old sender thread exit when changed
         self.server = server
         self.buffer = queue.Queue(maxsize=10)
-
-    def _handle_client(self):
+        self.buffer_lock = threading.Lock()
+        self.last_frame = None
+
+    def _put_frame(self, data):
+        if data is not None:
+            self.last_frame = data
+
+        # drop oldest frame when client is slow, encoder should never block
+        with self.buffer_lock:
+            try:
+                self.buffer.put_nowait(data)
+            except queue.Full:
+                try:
+                    self.buffer.get_nowait()
+                except queue.Empty:
+                    pass
+                self.buffer.put_nowait(data)
+
+    def _wake_sender(self):
+        # None frame only wake sender up, it has no image
+        with self.buffer_lock:
+            try:
+                self.buffer.put_nowait(None)
+            except queue.Full:
+                pass  # sender already has frame to wake up for
+
+    def _get_latest(self):
+        # every frame is a full image, when sender is behind only newest one is useful
+        frame = self.buffer.get()
+        while True:
+            try:
+                newer = self.buffer.get_nowait()
+            except queue.Empty:
+                return frame
+            if newer is not None:
+                frame = newer
+
+    def _handle_client(self, session):
         try:
-            while self.running:
-                data2send = self.buffer.get()
+            while self.running and self.session == session:
+                data2send = self._get_latest()
+                if self.session != session:
+                    break
+
+                with self.clients_lock:
+                    channels = list(self.clients)
+                    pending, self.pending = self.pending, set()
+
+                last_frame = self.last_frame
+
+                dead = []
+                for channel in channels:
+                    # new channel get newest frame, screen may be static and never send again
+                    frame = (last_frame or data2send) if channel in pending else data2send
+                    if frame is None:
+                        continue
 
-                for iclient in self.listclient:
                     try:
-                        iclient[2].sendall(data2send)
+                        channel.sendall(frame)
                     except Exception as e:
-                        iclient[2].close()
-                        self.listclient.remove(iclient)
-
-                if not self.listclient:
-                    self.running = False
-                    self.first = True
-                    logger.info("No clients connected. Server is standby")
-                    break
+                        channel.close()
+                        dead.append(channel)
+
+                with self.clients_lock:
+                    for channel in dead:
+                        self.clients.pop(channel, None)
+
+                    if not self.clients:
+                        self.running = False
+                        self.first = True
+                        self.deinit()
+                        logger.info("No clients connected. Server is standby")
+                        break
 
         except socket.error:
             pass
@@ -80,13 +187,12 @@ class Protocol:
 
                 try:
                     # Receive the length of the data
-                    data_length = self._receive_exact(client_socket, 4)
+                    data_length = self._receive_exact(client_socket, _LEN.size)
                     if not data_length:
                         break
 
-                    commandmetadata = struct.unpack('!I', data_length)
-                    command_data = self._receive_exact(client_socket, commandmetadata[0])
-                    command = pickle.loads(command_data)
+                    command_data = self._receive_exact(client_socket, _LEN.unpack(data_length)[0])
+                    command = msgpack.unpackb(command_data, raw=False)
 
                     if command:
                         self.handle_commands(command, client)
@@ -101,17 +207,28 @@ class Protocol:
 
     def _receive_exact(self, socket, n):
         """Helper function to receive exactly n bytes."""
-        data = b''
-        while len(data) < n:
-            packet = socket.recv(n - len(data))
+        packet = socket.recv(n)
+        if not packet:
+            return None
+        if len(packet) == n:
+            return packet  # common case, whole command in one recv
+
+        chunks = [packet]
+        got = len(packet)
+        while got < n:
+            packet = socket.recv(n - got)
             if not packet:
                 return None
-            data += packet
-        return data
+            chunks.append(packet)
+            got += len(packet)
+        return b"".join(chunks)
 
     def init(self, client):
         pass
 
+    def deinit(self):
+        pass
+
     def handle_new_client(self, client: Client, directchannel=None):
         if directchannel:
             id = directchannel.get_id()
@@ -123,22 +240,42 @@ class Protocol:
                 logger.info("client is not connect in 5 sec")
                 return
 
-        self.listclient.append([client, id, channel])
+        with self.clients_lock:
+            self.clients[channel] = client
+            self.pending.add(channel)
 
-        if self.first:
-            self.running = True
-            handle_client_thread = threading.Thread(target=self._handle_client, daemon=True)
-            handle_client_thread.start()
+            first = self.first
+            if first:
+                self.running = True
+                self.first = False
+                self.session += 1
+            session = self.session
 
-            self.init(client)
+        if not first:
+            self._wake_sender()
+
+        if first:
+            handle_client_thread = threading.Thread(target=self._handle_client, args=(session,), daemon=True)
+            handle_client_thread.start()
 
-            self.first = False
+            try:
+                self.init(client)
+            except Exception:
+                # session can't start, don't leave it "running" for next client
+                with self.clients_lock:
+                    self.clients.pop(channel, None)
+                    self.pending.discard(channel)
+                    self.running = False
+                    self.first = True
+                channel.close()
+                self._wake_sender()  # let sender thread exit
+                raise
 
         command_thread = threading.Thread(target=self._handle_client_commands, args=(client, id), daemon=True)
         command_thread.start()
 
 class RemoDesk(Protocol):
-    def __init__(self, server=None, quality=50, compression=50, format="jpeg", resolution: set[int, int] = None, activity_threshold=None, second_compress=True):
+    def __init__(self, server=None, quality=50, compression=50, format="jpeg", resolution: set[int, int] = None, activity_threshold=None, second_compress=False, use_gpu=False, target_fps=30):
         """
         Args:
             server: ssh server
@@ -146,6 +283,10 @@ class RemoDesk(Protocol):
             compression: percent of compression 0-100 %
             format: jpeg, webp, avif
             resolution: resolution of remote
+            activity_threshold: pixel change (0-255) to count pixel as changed, None is always send
+            second_compress: brotli compress encoded image (little gain on jpeg/webp/avif, client must enable it too)
+            use_gpu: diff and resize frame on CUDA (require opencv with cuda)
+            target_fps: maximum frame rate to capture, None is unlimited
         """
 
         super().__init__(server)
@@ -156,69 +297,231 @@ class RemoDesk(Protocol):
         self.resolution = resolution
         self.threshold = activity_threshold
         self.compress2 = second_compress
+        self._bquality, self._lgwin = self._convert_quality(compression)
         self.screensize = ()
         self.previous_frame = None
+        self.period = 1.0 / target_fps if target_fps else 0
+
+        if format == "webp":
+            self._enc_ext, self._enc_params = '.webp', [int(cv2.IMWRITE_WEBP_QUALITY), quality]
+        elif format == "jpeg":
+            self._enc_ext, self._enc_params = '.jpeg', [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        elif format == "avif":
+            self._enc_ext, self._enc_params = '.avif', [int(cv2.IMWRITE_AVIF_QUALITY), quality]
+        else:
+            raise TypeError(f"{format} is not supported")
+
+        self._tj = None
+        if format == "jpeg" and TurboJPEG:
+            try:
+                self._tj = TurboJPEG()
+            except Exception as e:
+                logger.warning(f"libjpeg-turbo is not available, fallback to opencv: {e}")
+
+        self._op_table = {
+            "move_mouse": self._do_move_mouse,
+            "click_mouse": self._do_click_mouse,
+            "keyboard": self._do_keyboard,
+        }
+        self._mouse_buttons = {1: mouse.LEFT, 2: mouse.MIDDLE, 3: mouse.RIGHT}
+        self._pending_move = None
+        self._move_lock = threading.Lock()
+        self._move_event = threading.Event()
+
+        self._resize_flag = None
+        self._sx = self._sy = 1.0
+
+        self._cam = None
+        self._backend = None  # dxcam, mss or pil, selected in init
+        self._need_frame = True
+        self._mss_local = threading.local()  # mss handle per grabber thread
+        self._last_grab = None
+
+        self._stop = None  # stop event of current session
+        self._threads = []
+
+        self.use_gpu = use_gpu and hasattr(cv2, "cuda") and cv2.cuda.getCudaEnabledDeviceCount() > 0
+        if use_gpu and not self.use_gpu:
+            logger.warning("CUDA is not available. Fallback to CPU")
+
+        if _count_changed and self.threshold and not self.use_gpu:
+            # compile now, not on first frame of session
+            warmup = np.zeros((1, 1, 3), dtype=np.uint8)
+            _count_changed(warmup, warmup, self.threshold)
+
+        if self.use_gpu:
+            # persistent device buffers, nothing is allocated per frame
+            self._gpu_cur = cv2.cuda_GpuMat()
+            self._gpu_small = [cv2.cuda_GpuMat(), cv2.cuda_GpuMat()]  # current, previous
+            self._gpu_diff = cv2.cuda_GpuMat()
+            self._gpu_gray = cv2.cuda_GpuMat()
+            self._gpu_thresh = cv2.cuda_GpuMat()
+            self._gpu_resized = cv2.cuda_GpuMat()
+            self._resized_buf = None  # host buffer for resized frame
+
+    def _init_backend(self):
+        # first backend that can really query the screen is used for this session
+        backends = [name for name, available in (("dxcam", dxcam), ("mss", mss), ("pil", True)) if available]
+        for backend in backends:
+            self._backend = backend
+            try:
+                self.screensize = self._query_screensize()
+                return
+            except Exception as e:
+                logger.warning(f"{backend} capture is not available, fallback: {e}")
+                self._cam = None
+
+        self._backend = None
+        raise RuntimeError("No screen capture backend is available")
+
+    def _fallback_backend(self, error):
+        # runtime capture error, don't retry broken backend forever
+        if self._backend == "dxcam":
+            self._backend = "mss" if mss else "pil"
+            self._cam = None
+            logger.warning(f"dxcam capture failed, fallback to {self._backend}: {error}")
+        else:
+            logger.error(f"Screen capture failed: {error}")
+
+    def _query_screensize(self):
+        if self._backend == "dxcam":
+            if self._cam is None:
+                self._cam = dxcam.create(output_color="BGR")
+            if self._cam is None:
+                raise RuntimeError("dxcam.create failed")
+            return self._cam.width, self._cam.height
+        elif self._backend == "mss":
+            # monitor geometry is in logical point, grab once to get real pixel size (HiDPI)
+            with mss.mss() as sct:
+                screenshot = sct.grab(sct.monitors[1])
+            return screenshot.width, screenshot.height
+
+        return ImageGrab.grab().size
+
+    def _get_buffer(self, buf, shape):
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+        return buf
+
+    def _capture_screen(self, buf=None):
+        if self._backend == "dxcam":
+            return self._capture_screen_dxcam()
+        elif self._backend == "mss":
+            return self._capture_screen_mss(buf)
 
-    def _capture_screen(self):
         try:
             screenshot = ImageGrab.grab()
-            self.screensize = screenshot.size
-            img_np = np.array(screenshot)
-            img_bgr = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-            return img_bgr
-        except:
+            img_np = np.asarray(screenshot)
+            buf = self._get_buffer(buf, img_np.shape)
+
+            # swap channel into reused frame buffer
+            return cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR, dst=buf)
+        except Exception as e:
+            self._fallback_backend(e)
             return b""
 
-    def _detect_activity(self, current_frame):
-        if self.threshold:
-            if self.previous_frame is None:
-                self.previous_frame = current_frame
-                return False  # No previous frame to compare to
+    def _capture_screen_dxcam(self):
+        try:
+            # desktop duplication return None when nothing changed
+            frame = self._cam.grab()
+            if frame is None:
+                if not self._need_frame or self._last_grab is None:
+                    return None
+                frame = self._last_grab
+
+            self._last_grab = frame
+            self._need_frame = False
+            return frame
+        except Exception as e:
+            self._fallback_backend(e)
+            return b""
+
+    def _capture_screen_mss(self, buf=None):
+        try:
+            local = self._mss_local
+            if getattr(local, "sct", None) is None:
+                # mss handle must be created in the thread that use it
+                local.sct = mss.mss()
+                local.monitor = local.sct.monitors[1]
+
+            screenshot = local.sct.grab(local.monitor)
+            # raw is BGRA bytearray, view it without copy (bgra property make a copy)
+            img_bgra = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+            # mss is already BGR(A), drop alpha and reuse frame buffer
+            buf = self._get_buffer(buf, (screenshot.height, screenshot.width, 3))
+            np.copyto(buf, img_bgra[:, :, :3])
+            return buf
+        except Exception as e:
+            self._fallback_backend(e)
+            return b""
 
-            # Compute the absolute difference between the current frame and the previous frame
-            diff = cv2.absdiff(current_frame, self.previous_frame)
+    def _upload_frame(self, image):
+        self._gpu_cur.upload(image)
 
-            # Convert the difference to grayscale
-            gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+    def _detect_activity(self, current_frame):
+        if self.threshold:
+            # Compare on 1/16 area copy, enough for activity detection and much less memory to touch
+            if self.use_gpu:
+                w, h = self._gpu_cur.size()
+                small = cv2.cuda.resize(self._gpu_cur, (w // 4, h // 4), dst=self._gpu_small[0], interpolation=cv2.INTER_AREA)
+                # next frame resize into the other buffer, keep this one as previous
+                self._gpu_small.reverse()
+            else:
+                small = cv2.resize(current_frame, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
 
-            # Apply a threshold to get a binary image
-            _, thresh = cv2.threshold(gray_diff, self.threshold, 255, cv2.THRESH_BINARY)
+            if self.previous_frame is None:
+                self.previous_frame = small
+                return True  # No previous frame to compare to, client need full frame
 
-            # Calculate the number of non-zero pixels in the thresholded image
-            non_zero_count = np.count_nonzero(thresh)
+            # screen mode changed, never compare different shape (numba kernel has no bounds check)
+            if self.use_gpu:
+                changed = small.size() != self.previous_frame.size()
+            else:
+                changed = small.shape != self.previous_frame.shape
+
+            if changed:
+                self.previous_frame = small
+                return True
+
+            # Count pixels that grayscale difference is over threshold
+            if self.use_gpu:
+                diff = cv2.cuda.absdiff(small, self.previous_frame, dst=self._gpu_diff)
+                gray_diff = cv2.cuda.cvtColor(diff, cv2.COLOR_BGR2GRAY, dst=self._gpu_gray)
+                _, thresh = cv2.cuda.threshold(gray_diff, self.threshold, 255, cv2.THRESH_BINARY, dst=self._gpu_thresh)
+                non_zero_count = cv2.cuda.countNonZero(thresh)
+            elif _count_changed:
+                non_zero_count = _count_changed(small, self.previous_frame, self.threshold)
+            else:
+                gray_diff = cv2.cvtColor(cv2.absdiff(small, self.previous_frame), cv2.COLOR_BGR2GRAY)
+                non_zero_count = np.count_nonzero(gray_diff > self.threshold)
 
             # Update the previous frame
-            self.previous_frame = current_frame
+            self.previous_frame = small
 
-            # If there are enough non-zero pixels, we consider it as activity
-            return non_zero_count > 500  # You can adjust the threshold as needed
+            # If there are enough changed pixels, we consider it as activity
+            return non_zero_count > ACTIVITY_PIXELS
         else:
             return True
 
     def _imagenc(self, image):
-        if self.format == "webp":
-            retval, buffer = cv2.imencode('.webp', image, [int(cv2.IMWRITE_WEBP_QUALITY), self.quality])
-        elif self.format == "jpeg":
-            retval, buffer = cv2.imencode('.jpeg', image, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
-        elif self.format == "avif":
-            retval, buffer = cv2.imencode('.avif', image, [int(cv2.IMWRITE_AVIF_QUALITY), self.quality])
+        if self._tj:
+            return self._tj.encode(image, quality=self.quality, pixel_format=TJPF_BGR)
 
-        else:
-            raise TypeError(f"{self.format} is not supported")
+        retval, buffer = cv2.imencode(self._enc_ext, image, self._enc_params)
 
         if not retval:
             raise ValueError("image encoding failed.")
 
-        return np.array(buffer).tobytes()
+        return buffer.tobytes()
+
+    def _update_scale(self):
+        res_w, res_h = self.resolution or (1920, 1080)
+        self._sx = self.screensize[0] / res_w
+        self._sy = self.screensize[1] / res_h
 
     def _translate_coordinates(self, x, y):
-        if self.resolution:
-            translated_x = int(x * (self.screensize[0] / self.resolution[0]))
-            translated_y = int(y * (self.screensize[1] / self.resolution[1]))
-        else:
-            translated_x = int(x * (self.screensize[0] / 1920))
-            translated_y = int(y * (self.screensize[1] / 1090))
-        return translated_x, translated_y
+        return int(x * self._sx), int(y * self._sy)
 
     def _convert_quality(self, quality):
         brotli_quality = int(quality / 100 * 11)
@@ -226,69 +529,191 @@ class RemoDesk(Protocol):
 
         return brotli_quality, lgwin
 
-    def _capture(self):
-        while self.running:
-            screen_image = self._capture_screen()
+    def _select_resize_flag(self):
+        if tuple(self.resolution) == tuple(self.screensize):
+            return None  # same size, no resize needed
 
-            if self._detect_activity(screen_image):
-                if self.resolution:
-                    screen_image = cv2.resize(screen_image, self.resolution, interpolation=cv2.INTER_NEAREST)
+        if self.resolution[0] < self.screensize[0] or self.resolution[1] < self.screensize[1]:
+            return cv2.INTER_AREA
+
+        # cuda resize has no exact linear
+        return cv2.INTER_LINEAR if self.use_gpu else cv2.INTER_LINEAR_EXACT
+
+    def _resize(self, image):
+        if self._resize_flag is None:
+            return image
+
+        if self.use_gpu:
+            cv2.cuda.resize(self._gpu_cur, self.resolution, dst=self._gpu_resized, interpolation=self._resize_flag)
+            self._resized_buf = self._get_buffer(self._resized_buf, (self.resolution[1], self.resolution[0], 3))
+            return self._gpu_resized.download(self._resized_buf)
+
+        return cv2.resize(image, self.resolution, interpolation=self._resize_flag)
+
+    def _close_mss(self):
+        # close handle of this thread, next session create new one in new grabber
+        sct = getattr(self._mss_local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._mss_local.sct = None
+
+    def _grabber(self, stop, raw_q, free_q):
+        try:
+            self._grab_loop(stop, raw_q, free_q)
+        finally:
+            self._close_mss()
+
+    def _grab_loop(self, stop, raw_q, free_q):
+        next_deadline = time.monotonic()
+        while not stop.is_set():
+            if self.period:
+                sleep_for = next_deadline + self.period - time.monotonic()
+                if sleep_for > 0:
+                    stop.wait(sleep_for)
+                    next_deadline += self.period
                 else:
-                    self.resolution = self.screensize
+                    # too slow, don't try to catch up
+                    next_deadline = time.monotonic()
+
+            try:
+                buf = free_q.get_nowait()
+            except queue.Empty:
+                # encoder is behind, overwrite oldest captured frame
+                try:
+                    buf = raw_q.get_nowait()
+                except queue.Empty:
+                    continue
+
+            screen_image = self._capture_screen(buf)
+            if not isinstance(screen_image, np.ndarray):
+                free_q.put_nowait(buf)
+                if not self.period:
+                    stop.wait(IDLE_WAIT)  # don't spin on unchanged screen
+                continue  # screen is not changed or capture failed
+
+            raw_q.put_nowait(screen_image)
+
+    def _encoder(self, stop, raw_q, free_q):
+        while not stop.is_set():
+            try:
+                screen_image = raw_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                self._encode_frame(screen_image)
+            except Exception as e:
+                logger.error(f"Error in encoder: {e}")
+            finally:
+                free_q.put_nowait(screen_image)
 
-                data = self._imagenc(screen_image)
+    def _encode_frame(self, screen_image):
+        if self.use_gpu and (self.threshold or self._resize_flag is not None):
+            self._upload_frame(screen_image)
 
-                if self.compress2:
-                    bquality, lgwin = self._convert_quality(self.compression)
-                    data = brotli.compress(data, quality=bquality, lgwin=lgwin)
+        if self._detect_activity(screen_image):
+            screen_image = self._resize(screen_image)
 
-                data_length = struct.pack('!III', len(data), self.resolution[0], self.resolution[1])
-                data2send = data_length + data
+            data = self._imagenc(screen_image)
 
-                print(f"Sending data length: {len(data2send)}")
-                self.buffer.put(data2send)
+            if self.compress2:
+                data = brotli.compress(data, quality=self._bquality, lgwin=self._lgwin)
+
+            data_length = _HDR.pack(len(data), self.resolution[0], self.resolution[1])
+            data2send = data_length + data
+
+            logger.debug(f"Sending data length: {len(data2send)}")
+            self._put_frame(data2send)
 
     def handle_commands(self, command, client):
-        action = command["action"]
-        data = command["data"]
+        handler = self._op_table.get(command["action"])
+        if handler:
+            handler(command["data"])
+
+    def _do_move_mouse(self, data):
+        # applied by mouse worker, intermediate position is dropped
+        pos = self._translate_coordinates(data["x"], data["y"])
+        with self._move_lock:
+            self._pending_move = pos
+        self._move_event.set()
+
+    def _flush_move(self):
+        with self._move_lock:
+            if self._pending_move:
+                mouse.move(*self._pending_move)
+                self._pending_move = None
+
+    def _mouse_worker(self, stop):
+        while not stop.is_set():
+            # sleep until mouse is moved or session is stopped
+            self._move_event.wait()
+            self._move_event.clear()
+            if stop.is_set():
+                break
+
+            # collect more move in this interval, then apply latest
+            time.sleep(MOUSE_INTERVAL)
+            self._flush_move()
+
+    def _do_click_mouse(self, data):
+        # click must happen at latest position
+        self._flush_move()
+
+        button = self._mouse_buttons.get(data["button"])
+        if button is None:
+            # 4, 5 is wheel (not supported yet)
+            return
+
+        if data["state"] == "down":
+            mouse.press(button)
+        else:
+            mouse.release(button)
 
-        if action == "move_mouse":
-            x, y = data["x"], data["y"]
-            rx, ry = self._translate_coordinates(x, y)
-            mouse.move(rx, ry)
+    def _do_keyboard(self, data):
+        if data["state"] == "down":
+            keyboard.press(data["key"])
+        else:
+            keyboard.release(data["key"])
 
-        elif action == "click_mouse":
-            button = data["button"]
-            state = data["state"]
+    def deinit(self):
+        if self._stop:
+            self._stop.set()
+            self._move_event.set()  # wake mouse worker
 
-            if button == 1:
-                if state == "down":
-                    mouse.press()
-                else:
-                    mouse.release()
-            elif button == 2:
-                if state == "down":
-                    mouse.press(mouse.MIDDLE)
-                else:
-                    mouse.release(mouse.MIDDLE)
-            elif button == 3:
-                if state == "down":
-                    mouse.press(mouse.RIGHT)
-                else:
-                    mouse.release(mouse.RIGHT)
-            # elif button == 4:
-            #    mouse.wheel()
-            # elif button == 5:
-            #    mouse.wheel(-1)
-        elif action == "keyboard":
-            key = data["key"]
-            state = data["state"]
-
-            if state == "down":
-                keyboard.press(key)
-            else:
-                keyboard.release(key)
+    def _stop_session(self):
+        # wait old threads exit, they share frame state and buffers with new session
+        self.deinit()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
 
     def init(self, client):
-        capture_thread = threading.Thread(target=self._capture, daemon=True)
-        capture_thread.start()
\ No newline at end of file
+        self._stop_session()
+
+        # screen geometry is queried once per session, not every frame
+        self._init_backend()
+        if not self.resolution:
+            self.resolution = self.screensize
+
+        self._resize_flag = self._select_resize_flag()
+        self._update_scale()
+
+        self.previous_frame = None
+        self._need_frame = True
+        self.last_frame = None
+
+        # queues belong to this session only, bounded by ring buffers so put never fail
+        stop = threading.Event()
+        raw_q = queue.Queue(maxsize=RING_SIZE)  # captured frame
+        free_q = queue.Queue()  # capture buffer ready to reuse
+        for _ in range(RING_SIZE):
+            free_q.put_nowait(None)  # allocated on first capture
+
+        self._stop = stop
+        self._threads = [
+            threading.Thread(target=self._grabber, args=(stop, raw_q, free_q), daemon=True),
+            threading.Thread(target=self._encoder, args=(stop, raw_q, free_q), daemon=True),
+            threading.Thread(target=self._mouse_worker, args=(stop,), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
\ No newline at end of file